@@ -68,8 +68,10 @@ weib = 1 #weibul parameter
 Simple RW motion with random steps
 '''
 
-x = np.cumsum(np.random.randn(n))
-y = np.cumsum(np.random.randn(n)) 
+from random_streams import trajectory_rng
+from random_walks import simple_random_walk, ctrw, interpolate_trajectory
+seed = 2020 # seed of the ensemble, trajectory number i is generated with trajectory_rng(seed, i)
+x, y = simple_random_walk(n, rng=trajectory_rng(seed, 0)).T
 
 '''
 Now we introduce some CTRW motion in between the steps driven from 
@@ -78,17 +80,13 @@ Now we introduce some CTRW motion in between the steps driven from
  Random normal distribution
 '''
 
-x =  np.cumsum(np.random.exponential(1./beta, n))
-y =  np.cumsum(np.random.exponential(1./beta, n))
+x, y = ctrw(n, 'exponential', beta=beta, rng=trajectory_rng(seed, 1)).T
 
-x_w = np.cumsum(np.random.weibull(weib, n))
-y_w = np.cumsum(np.random.weibull(weib, n))
+x_w, y_w = ctrw(n, 'weibull', weib=weib, rng=trajectory_rng(seed, 2)).T
 
-x =  np.cumsum(np.random.pareto(a, n))
-y =  np.cumsum(np.random.pareto(a, n))
+x, y = ctrw(n, 'pareto', a=a, rng=trajectory_rng(seed, 3)).T
 
-x_n =  np.cumsum(np.random.normal(mu, sigma, n))
-y_n =  np.cumsum(np.random.normal(mu, sigma, n))
+x_n, y_n = ctrw(n, 'normal', mu=mu, sigma=sigma, rng=trajectory_rng(seed, 4)).T
 
 
 # We add 10 intermediary points between two
@@ -99,13 +97,13 @@ y_n =  np.cumsum(np.random.normal(mu, sigma, n))
 Now the trajectory is recorded in two arrays x2, y2
 '''
 k = 10
-X_tr = np.interp(np.arange(n * k), np.arange(n) * k, x)
-Y_tr = np.interp(np.arange(n * k), np.arange(n) * k, y)
+X_tr = interpolate_trajectory(x, k)
+Y_tr = interpolate_trajectory(y, k)
 #print('x2 rw', x2)
 
 
-X_tr2 = np.interp(np.arange(n * k), np.arange(n) * k, x_n)
-Y_tr2 = np.interp(np.arange(n * k), np.arange(n) * k, y_n)
+X_tr2 = interpolate_trajectory(x_n, k)
+Y_tr2 = interpolate_trajectory(y_n, k)
 
 
 '''
@@ -361,7 +359,8 @@ LOADING input data:
 """
 
 #data points should be data from trajectories of researchers
-datarandom = np.random.rand(N,M) #generate N datapoints in M dimensions
+from random_streams import trajectory_rng
+datarandom = trajectory_rng(seed, 5).random((N,M)) #generate N datapoints in M dimensions
 #data = np.random.rand(30, 2)   # 30 random points in 2-D
 
 #load trajectory from the file or from above
@@ -664,8 +663,9 @@ def func(x, a, b, c):
 
 xdata = np.linspace(0, 4, 50)
 y = func(xdata, 2.5, 1.3, 0.5)
-np.random.seed(1729)
-y_noise = 0.2 * np.random.normal(size=xdata.size)
+from random_streams import trajectory_rng
+rng = trajectory_rng(1729) # stream of random numbers for noise, see random_streams.py
+y_noise = 0.2 * rng.normal(size=xdata.size)
 ydata = y + y_noise
 plt.plot(xdata, ydata, 'b-', label='data')
 
@@ -729,7 +729,9 @@ max_time = 100
 dt = max_time / N
 
 t = np.linspace(0, max_time, N)
-xy = np.cumsum(np.random.choice([-1, 0, 1], size=(N, 2)), axis=0)
+from random_streams import trajectory_rng
+from random_walks import lattice_random_walk
+xy = lattice_random_walk(N - 1, dims=2, rng=trajectory_rng(seed, 6))
 traj = pd.DataFrame({'t': t, 'x': xy[:,0], 'y': xy[:,1]})
 print(traj.head())
 
@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+'''
+Convex hull analysis of trajectories on many time scales.
+
+The sliding window analysis from analysis_of_trajectories.ipynb measures the volume
+of convex hull V(t, t + dt) for one window size dt, and the result depends on the size
+of the window. Here we compute hull volume and area series for a geometric set of
+window sizes dt = size_window * 2^s in one pass.
+
+Hull of a window of size 2w is the hull of the two windows of size w it consists of,
+so we only need to keep hull vertices of each window (sparse table) and merge them
+level by level, instead of recomputing hull from all points of every window.
+In 1D and 2D hulls of all windows of one level are computed at once with numpy
+(in 2D with Andrew's monotone chain algorithm, one step of the chain for all windows),
+in higher dimensions there is one qhull call per window.
+'''
+
+import numpy as np
+from scipy.spatial import ConvexHull, QhullError
+
+
+def hull_vertices(points):
+    '''
+    points - array (number of points, dimensions)
+    returns vertices of convex hull of the points, volume and area of the hull.
+    For degenerate point sets (e.g. all points on a line) hull does not exist,
+    then we keep all distinct points and volume is 0. In 2D area of the degenerate
+    hull is the perimeter of the segment (twice its length), as for qhull, in higher
+    dimensions it is 0.
+    In 1D hull is the segment [min, max], its volume is the length of the segment.
+    '''
+    if points.shape[1] == 1:
+        vertices = np.array([points.min(axis=0), points.max(axis=0)])
+        return vertices, float(vertices[1, 0] - vertices[0, 0]), 0.
+    try:
+        hull = ConvexHull(points)
+    except (QhullError, ValueError):
+        vertices = np.unique(points, axis=0)
+        area = 0.
+        if points.shape[1] == 2 and len(vertices) > 1:
+            # points lie on a line, the length of the segment is the extent along the line
+            centered = vertices - vertices.mean(axis=0)
+            direction = np.linalg.svd(centered, full_matrices=False)[2][0]
+            area = 2 * float(np.ptp(centered @ direction))
+        return vertices, 0., area
+    return points[hull.vertices], hull.volume, hull.area
+
+
+def _take(points, index):
+    return np.take_along_axis(points, index[..., None], axis=1)
+
+
+def _chain_2d(points, count, index):
+    '''
+    one half (lower or upper) of the monotone chain for all windows at once
+    points - sorted points (windows, k, 2), count - number of points in every window
+    index(j) - index of the j-th point of the chain in every window
+    '''
+    n, k, _ = points.shape
+    stack = np.zeros((n, k, 2))
+    size = np.zeros(n, dtype=np.int64)
+    for j in range(k):
+        # only windows with more than j points
+        rows = np.flatnonzero(j < count)
+        p = points[rows, index(j)[rows]]
+        top = size[rows]
+        while True:
+            a = stack[rows, np.maximum(top - 2, 0)]
+            b = stack[rows, np.maximum(top - 1, 0)]
+            cross = (b[:, 0] - a[:, 0]) * (p[:, 1] - a[:, 1]) - (b[:, 1] - a[:, 1]) * (p[:, 0] - a[:, 0])
+            pop = (top >= 2) & (cross <= 0)
+            if not pop.any():
+                break
+            top -= pop
+        stack[rows, top] = p
+        size[rows] = top + 1
+    return stack, size
+
+
+def _inside_octagon(points, valid):
+    '''
+    points strictly inside the polygon of extreme points of every window in 8 directions,
+    they are not vertices of the hull (Akl-Toussaint heuristic)
+    '''
+    angles = np.arange(8) * np.pi / 4
+    projection = np.where(valid[..., None], points @ np.stack((np.cos(angles), np.sin(angles))), -np.inf)
+    # extreme points in directions of growing angle are hull vertices in counterclockwise order
+    extreme = _take(points, projection.argmax(axis=1))
+    x, y = points[..., 0], points[..., 1]
+    inside = valid.copy()
+    for e in range(8):
+        a, b = extreme[:, e], extreme[:, (e + 1) % 8]
+        edge = b - a
+        # the point is on the left of the edge: edge x (point - a) > 0,
+        # repeated extreme points give edges of zero length, they are skipped
+        cross = edge[:, None, 0] * y - edge[:, None, 1] * x
+        bound = edge[:, 0] * a[:, 1] - edge[:, 1] * a[:, 0]
+        inside &= (cross > bound[:, None]) | (edge == 0).all(axis=1)[:, None]
+    return inside & ~(extreme == extreme[:, :1]).all(axis=(1, 2))[:, None]
+
+
+def hulls_2d(points, valid):
+    '''
+    convex hulls of many small point sets in 2D at once
+    points - array (windows, k, 2), valid - array (windows, k), False for padding points
+    returns vertices (windows, m, 2) in counterclockwise order, valid vertices (windows, m),
+    volume (area of the polygon) and area (perimeter of the polygon), as qhull in 2D
+    '''
+    n, k, _ = points.shape
+    if k > 16:
+        # points inside the octagon of extreme points are dropped before the chain
+        valid = valid & ~_inside_octagon(points - points[:, :1], valid)
+    count = valid.sum(axis=1)
+    # sort points of every window by x, then by y, padding goes to the end
+    order = np.lexsort((np.where(valid, points[..., 1], np.inf),
+                        np.where(valid, points[..., 0], np.inf)), axis=-1)
+    k = max(int(count.max()), 1)
+    points = _take(points, order[:, :k])
+    # coordinates relative to the first point of the window, for precision of areas
+    origin = points[:, :1].copy()
+    points = points - origin
+
+    lower, n_lower = _chain_2d(points, count, lambda j: np.full(n, j))
+    upper, n_upper = _chain_2d(points, count, lambda j: np.clip(count - 1 - j, 0, None))
+
+    # hull is the lower chain and the upper chain without their last points
+    m = np.where(count >= 2, n_lower + n_upper - 2, count)
+    index = np.arange(max(m.max(), 1))[None, :]
+    from_lower = index < (n_lower - 1)[:, None]
+    vertices = np.where(from_lower[..., None],
+                        _take(lower, np.clip(index, 0, k - 1)),
+                        _take(upper, np.clip(index - (n_lower - 1)[:, None], 0, k - 1)))
+    hull_valid = index < m[:, None]
+    vertices[~hull_valid] = 0.
+
+    following = _take(vertices, np.where(index + 1 < m[:, None], index + 1, 0))
+    cross = vertices[..., 0] * following[..., 1] - following[..., 0] * vertices[..., 1]
+    volume = 0.5 * np.abs(np.where(hull_valid, cross, 0.).sum(axis=1))
+    edges = np.sqrt(((following - vertices) ** 2).sum(axis=2))
+    area = np.where(hull_valid, edges, 0.).sum(axis=1)
+    return vertices + origin, hull_valid, volume, area
+
+
+def convex_hull_multiscale(data, size_window=16, n_scales=6):
+    '''
+    data - trajectory, array (steps, dimensions)
+    size_window - smallest time size of the sliding window
+    n_scales - number of window sizes size_window * 2^s, s = 0, ..., n_scales-1
+
+    returns
+    windows - array of window sizes
+    volume_array - array (n_scales, steps), volume of convex hull of data[t: t+window]
+    area_array - array (n_scales, steps), area of convex hull of data[t: t+window]
+    Times for which the window does not fit into the trajectory are NaN.
+    '''
+    data = np.asarray(data, dtype=np.float64)
+    if data.ndim == 1:
+        data = data[:, None]
+    steps, dims = data.shape
+
+    windows = size_window * 2 ** np.arange(n_scales)
+    volume_array = np.full((n_scales, steps), np.nan)
+    area_array = np.full((n_scales, steps), np.nan)
+    n_windows = steps - size_window + 1
+    if n_windows <= 0:
+        return windows, volume_array, area_array
+
+    # level 0: hulls of all windows of the smallest size are computed from the points
+    if dims <= 2:
+        points = np.lib.stride_tricks.sliding_window_view(data, size_window, axis=0).transpose(0, 2, 1)
+    if dims == 1:
+        low, high = points.min(axis=1)[:, 0], points.max(axis=1)[:, 0]
+        volume_array[0, :n_windows] = high - low
+        area_array[0, :n_windows] = 0.
+    elif dims == 2:
+        vertices, valid, volume, area = hulls_2d(points, np.ones(points.shape[:2], dtype=bool))
+        volume_array[0, :n_windows] = volume
+        area_array[0, :n_windows] = area
+    else:
+        level = []
+        for itime in range(n_windows):
+            vertices, volume, area = hull_vertices(data[itime: itime + size_window])
+            level.append(vertices)
+            volume_array[0, itime] = volume
+            area_array[0, itime] = area
+
+    # level s: window [t, t+2w) is the union of windows [t, t+w) and [t+w, t+2w)
+    for s in range(1, n_scales):
+        half = windows[s - 1]
+        n_windows = steps - windows[s] + 1
+        if n_windows <= 0:
+            break
+        if dims == 1:
+            low = np.minimum(low[:n_windows], low[half: half + n_windows])
+            high = np.maximum(high[:n_windows], high[half: half + n_windows])
+            volume_array[s, :n_windows] = high - low
+            area_array[s, :n_windows] = 0.
+        elif dims == 2:
+            points = np.concatenate((vertices[:n_windows], vertices[half: half + n_windows]), axis=1)
+            valid = np.concatenate((valid[:n_windows], valid[half: half + n_windows]), axis=1)
+            vertices, valid, volume, area = hulls_2d(points, valid)
+            volume_array[s, :n_windows] = volume
+            area_array[s, :n_windows] = area
+        else:
+            merged = []
+            for itime in range(n_windows):
+                points = np.concatenate((level[itime], level[itime + half]))
+                vertices, volume, area = hull_vertices(points)
+                merged.append(vertices)
+                volume_array[s, itime] = volume
+                area_array[s, itime] = area
+            level = merged
+
+    return windows, volume_array, area_array
+
+
+def convex_hull_multiscale_all(trajectories, size_window=16, n_scales=6):
+    '''
+    trajectories - list of trajectories, each is array (steps, dimensions)
+    returns windows and lists of (scales x time) volume and area matrices,
+    one for every trajectory
+    '''
+    volumes = []
+    areas = []
+    windows = size_window * 2 ** np.arange(n_scales)
+    for data in trajectories:
+        windows, volume_array, area_array = convex_hull_multiscale(data, size_window, n_scales)
+        volumes.append(volume_array)
+        areas.append(area_array)
+    return windows, volumes, areas
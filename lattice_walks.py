@@ -0,0 +1,361 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+'''
+Random walks on the N-dimensional hypercubic lattice Z^d and polymer chains.
+
+1. simple random walk: each step goes to one of 2d neighbours;
+2. non-reversing random walk: the step can not go back to the previous site;
+3. self-avoiding walk (SAW): the walk never visits the same site twice, model of polymer chain.
+   SAW is grown by Rosenbluth method: each step goes to one of k free neighbours and the
+   chain gets weight W = k_1 k_2 ... k_N. With PERM (pruned-enriched Rosenbluth method,
+   P.Grassberger, Phys. Rev. E 56, 3682 (1997)) a chain with weight much larger than the
+   current estimate of the mean weight at length N is copied and a chain with much smaller
+   weight is removed, so that chains of 10^5 monomers can be grown without losing all of them.
+   As in nPERM (H.-P.Hsu, W.Nadler, P.Grassberger, Macromolecules 36, 4658 (2003)) copies
+   of a chain make their next step to different free neighbours.
+
+Chain i is generated from its own random stream trajectory_rng(seed, i) (see random_streams.py),
+so it can be regenerated on its own. Simple and non-reversing walks of many chains are then
+grown at once with numpy.
+SAW is grown depth first, as in the original PERM: one tour starts from one monomer, copies
+of a chain wait in a stack and are grown after the current chain is finished. Different tours
+are independent, while chains of one tour share their beginning, so the number of independent
+samples at length N is the number of tours which reached N, not the number of chains.
+Tour i uses stream trajectory_rng(seed, i). Tours are grown in blocks, and blocks in rounds
+of 1, 1, 2, 4, ... blocks. Blocks of one round are grown in parallel processes, they start
+their estimates of the mean weights for pruning and enrichment from the sums over chains
+of all previous rounds. Sums of the blocks are merged after every round, so the result does
+not depend on the number of processes.
+Sites of the current chain are stored in a hashed set of integer keys of sites (python
+integers, so any dimension and length fit), and checking if a site is occupied costs O(1).
+
+For all walks we report mean square end-to-end distance R_e^2(N) and radius of gyration
+R_g^2(N) as functions of number of steps N, R ~ N^nu (nu = 1/2 for random walk,
+nu = 3/4 for SAW in 2D, nu ~ 0.588 for SAW in 3D).
+'''
+
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from random_streams import DEFAULT_SEED, trajectory_rng
+
+
+def lattice_directions(dims):
+    '''
+    returns array (2 dims, dims) of unit steps, direction 2i is +e_i and 2i+1 is -e_i,
+    so that the reverse of direction k is k ^ 1
+    '''
+    directions = np.zeros((2 * dims, dims), dtype=np.int64)
+    for i in range(dims):
+        directions[2 * i, i] = 1
+        directions[2 * i + 1, i] = -1
+    return directions
+
+
+def _chain_scaling(positions):
+    '''
+    positions - array (chains, steps + 1, dims)
+    returns R_e^2(N) and R_g^2(N) averaged over chains, N = 0, ..., steps
+    '''
+    positions = positions.astype(np.float64)
+    end_to_end2 = ((positions - positions[:, :1]) ** 2).sum(axis=2).mean(axis=0)
+    count = np.arange(1, positions.shape[1] + 1)[None, :, None]
+    mean = np.cumsum(positions, axis=1) / count
+    sq_mean = np.cumsum(positions ** 2, axis=1) / count
+    gyration2 = (sq_mean - mean ** 2).sum(axis=2).mean(axis=0)
+    return end_to_end2, gyration2
+
+
+def lattice_walk(n_steps, dims=2, n_chains=1, kind='simple', seed=DEFAULT_SEED, first=0, **params):
+    '''
+    n_steps - number of steps of each chain (number of monomers minus 1)
+    dims - dimension of the lattice
+    n_chains - number of chains, for self-avoiding walk number of PERM tours
+    kind - 'simple', 'non_reversing' or 'self_avoiding' (see self_avoiding_walk for params)
+    seed - seed of the ensemble, chain (tour) i is generated with trajectory_rng(seed, i)
+    first - index of the first chain, chains first, ..., first + n_chains - 1 are generated
+
+    returns dictionary
+    positions - array (chains, n_steps + 1, dims) of lattice sites
+    weights - weights of chains (all 1 for simple and non-reversing walks)
+    n - array of number of steps N
+    end_to_end2 - mean square end-to-end distance R_e^2(N)
+    gyration2 - mean square radius of gyration R_g^2(N)
+    '''
+    if kind == 'self_avoiding':
+        return self_avoiding_walk(n_steps, dims, n_chains, seed=seed, first=first, **params)
+
+    directions = lattice_directions(dims)
+    choice = np.zeros((n_chains, n_steps), dtype=np.int64)
+    rngs = [trajectory_rng(seed, i) for i in range(first, first + n_chains)]
+    if kind == 'simple':
+        for i, rng in enumerate(rngs):
+            choice[i] = rng.integers(0, 2 * dims, n_steps)
+    elif kind == 'non_reversing':
+        # the first step is any of 2d directions, the next direction is one of 2d - 1 directions
+        # after the reverse of the previous one
+        for i, rng in enumerate(rngs):
+            choice[i, :1] = rng.integers(0, 2 * dims, min(n_steps, 1))
+            choice[i, 1:] = rng.integers(1, 2 * dims, max(n_steps - 1, 0))
+        for t in range(1, n_steps):
+            choice[:, t] = ((choice[:, t - 1] ^ 1) + choice[:, t]) % (2 * dims)
+    else:
+        raise ValueError('unknown kind of lattice walk ' + str(kind))
+
+    positions = np.zeros((n_chains, n_steps + 1, dims), dtype=np.int64)
+    np.cumsum(directions[choice], axis=1, out=positions[:, 1:])
+    end_to_end2, gyration2 = _chain_scaling(positions)
+    return {'positions': positions,
+            'weights': np.ones(n_chains),
+            'n': np.arange(n_steps + 1),
+            'end_to_end2': end_to_end2,
+            'gyration2': gyration2}
+
+
+def self_avoiding_walk(n_steps, dims=2, n_tours=100, perm=True, enrich=2., prune=1. / 2,
+                       max_chains=None, seed=DEFAULT_SEED, first=0, block=100, n_jobs=1):
+    '''
+    n_steps - number of steps of each chain
+    dims - dimension of the lattice
+    n_tours - number of independent tours, each tour starts from one chain at N = 0
+    perm - if True, chains are pruned and enriched (PERM), otherwise plain Rosenbluth method
+           (one chain per tour)
+    enrich, prune - thresholds of weight relative to W_N = Z_N (c_N / c_0)^2, where Z_N is
+        the mean weight of chains of length N over tours done so far (of previous rounds and
+        of the block), c_N is the number of chains of length N and c_0 is the number of these tours
+        (Hsu, Grassberger 2011), so that every tour grows about the same number of chains at every N.
+        Chain with the next step weight W above enrich * W_N is copied into
+        min(k, W / (enrich * W_N)) chains (k free neighbours), which step to different neighbours.
+        Chain with weight W below prune * W_N is removed with probability 1 - W / (prune * W_N),
+        otherwise its weight becomes prune * W_N.
+    max_chains - chains are not copied when a tour has already grown max_chains of them
+                 (default no limit)
+    seed - seed of the ensemble, tour i is grown with trajectory_rng(seed, i)
+    first - index of the first tour, tours first, ..., first + n_tours - 1 are grown
+    block - number of tours of one block, blocks are grown in rounds of 1, 1, 2, 4, ... blocks,
+            blocks of one round are independent tasks for processes
+    n_jobs - number of processes, None means number of cores
+
+    returns dictionary as lattice_walk, with
+    positions - list of arrays (n_steps + 1, dims), the first chain of every tour which reached n_steps
+    weights - Rosenbluth weights of these chains divided by their mean
+    end_to_end2, gyration2 - weighted averages over all chains of length N of all tours
+    samples - number of chains of length N (they are correlated within one tour)
+    tours - number of tours which reached N, the number of independent samples
+    If all chains get trapped (no free neighbour), arrays are cut at the last N reached.
+    '''
+    if n_jobs is None:
+        n_jobs = os.cpu_count() or 1
+    starts = list(range(first, first + n_tours, block))
+    executor = ProcessPoolExecutor(max_workers=n_jobs) if n_jobs != 1 and len(starts) > 2 else None
+    # blocks are grown in rounds of 1, 1, 2, 4, ... blocks, blocks of a round start
+    # from the sums of all previous rounds, so only the first block learns thresholds alone
+    parts, prior, done = [], None, 0
+    try:
+        while done < len(starts):
+            tasks = [(n_steps, dims, seed, start, min(start + block, first + n_tours),
+                      perm, enrich, prune, max_chains, prior)
+                     for start in starts[done:done + max(done, 1)]]
+            if executor is None or len(tasks) == 1:
+                parts += [_perm_tours(task) for task in tasks]
+            else:
+                parts += list(executor.map(_perm_tours, tasks))
+            done += len(tasks)
+            prior = _merge_tours(parts)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    log_ref, samples, tours = prior['log_ref'], prior['samples'], prior['tours']
+    chains = [chain for part in parts for chain in part['chains']]
+    chain_log_weights = np.concatenate([part['chain_log_weights'] for part in parts])
+
+    last = int(np.flatnonzero(samples)[-1])
+    weights = np.exp(chain_log_weights - log_ref[n_steps]) if chains else np.zeros(0)
+    weight_sum = prior['weight_sum'][:last + 1]
+    return {'positions': chains,
+            'weights': weights / weights.mean() if chains else weights,
+            'n': np.arange(last + 1),
+            'end_to_end2': prior['end_to_end2'][:last + 1] / weight_sum,
+            'gyration2': prior['gyration2'][:last + 1] / weight_sum,
+            'samples': samples[:last + 1],
+            'tours': tours[:last + 1]}
+
+
+def _merge_tours(parts):
+    '''
+    sums of blocks of _perm_tours brought to the common reference weight of every N
+    '''
+    log_ref = np.fmax.reduce([part['log_ref'] for part in parts])
+    merged = {'log_ref': log_ref}
+    scales = [np.where(np.isnan(part['log_ref']), 0., np.exp(part['log_ref'] - log_ref)) for part in parts]
+    for name in ('weight_sum', 'end_to_end2', 'gyration2'):
+        merged[name] = np.sum([np.nan_to_num(part[name] * scale) for part, scale in zip(parts, scales)], axis=0)
+    for name in ('samples', 'tours'):
+        merged[name] = np.sum([part[name] for part in parts], axis=0)
+    merged['n_tours'] = sum(part['n_tours'] for part in parts)
+    return merged
+
+
+def _perm_tours(args):
+    '''
+    grows tours start, ..., stop - 1 of self_avoiding_walk with common thresholds,
+    estimated from the tours of the block done so far and from prior (merged sums of
+    previous blocks or None)
+    returns sums over chains of weights W / exp(log_ref[N]), of weighted R_e^2 and R_g^2,
+    numbers of chains and tours at every N and chains which reached n_steps
+    '''
+    n_steps, dims, seed, start, stop, perm, enrich, prune, max_chains, prior = args
+    if max_chains is None:
+        max_chains = np.inf
+    directions = lattice_directions(dims)
+    n_directions = 2 * dims
+    # site x is stored as integer key sum_i x_i base^i, |x_i| <= n_steps,
+    # neighbours differ by +-base^i (python integers do not overflow)
+    base = 2 * n_steps + 1
+    key_steps = [int(k) * base ** i for i in range(dims) for k in (1, -1)]
+    units = [tuple(int(x) for x in direction) for direction in directions]
+
+    # the current chain: key of site, position, sums of positions and of their squares,
+    # direction of the step to this site, for N = 0, ..., n_steps
+    keys = [0] * (n_steps + 1)
+    position = [(0,) * dims] * (n_steps + 1)
+    sum_pos = [(0,) * dims] * (n_steps + 1)
+    sum_sq = [0] * (n_steps + 1)
+    choice = [0] * (n_steps + 1)
+
+    # sums over chains of weights W / exp(log_ref[N]) and of weighted R_e^2 and R_g^2,
+    # weights are kept as logarithms, they change by many orders of magnitude with N
+    # (python lists, indexing of numpy arrays by one element is slow)
+    log_ref = [None] * (n_steps + 1)
+    weight_sum = [0.] * (n_steps + 1)
+    end_to_end2 = [0.] * (n_steps + 1)
+    gyration2 = [0.] * (n_steps + 1)
+    samples = [0] * (n_steps + 1)
+    tours = [0] * (n_steps + 1)
+    chains, chain_log_weights = [], []
+    # sums of previous blocks for the thresholds, in the same reference weights
+    if prior is None:
+        prior_weight, prior_samples, prior_tours = [0.] * (n_steps + 1), [0] * (n_steps + 1), 0
+    else:
+        log_ref = [None if np.isnan(ref) else float(ref) for ref in prior['log_ref']]
+        prior_weight, prior_samples = prior['weight_sum'].tolist(), prior['samples'].tolist()
+        prior_tours = prior['n_tours']
+
+    buffer = []
+
+    def uniform():
+        # random numbers are drawn from the stream of the tour in blocks
+        if not buffer:
+            buffer.extend(rng.random(256).tolist())
+        return buffer.pop()
+
+    for tour in range(start, stop):
+        rng = trajectory_rng(seed, tour)
+        buffer.clear()
+        done = prior_tours + tour - start + 1  # tours of previous blocks and of this one
+        occupied = {0}
+        n, log_w = 0, 0.
+        depth = -1  # the largest N reached in this tour
+        n_chains = 1
+        branches = []  # copies waiting to be grown: [N, log weight, list of their next steps]
+        while True:
+            # the chain has just reached N: it is counted in averages
+            if n > depth:
+                depth = n
+                tours[n] += 1
+                if n == n_steps:
+                    chains.append(np.concatenate((np.zeros((1, dims), dtype=np.int64),
+                                                  np.cumsum(directions[choice[1:]], axis=0))))
+                    chain_log_weights.append(log_w)
+            if log_ref[n] is None or log_w - log_ref[n] > 100.:
+                # new reference weight, so that sums do not overflow
+                if log_ref[n] is not None:
+                    scale = math.exp(log_ref[n] - log_w)
+                    weight_sum[n] *= scale
+                    prior_weight[n] *= scale
+                    end_to_end2[n] *= scale
+                    gyration2[n] *= scale
+                log_ref[n] = log_w
+            w = math.exp(log_w - log_ref[n])
+            count = n + 1
+            weight_sum[n] += w
+            end_to_end2[n] += w * sum(x * x for x in position[n])
+            gyration2[n] += w * ((count * sum_sq[n] - sum(x * x for x in sum_pos[n])) / count ** 2)
+            samples[n] += 1
+
+            steps = []
+            if n < n_steps:
+                key = keys[n]
+                free = [k for k in range(n_directions) if key + key_steps[k] not in occupied]
+            if n < n_steps and free:
+                # Rosenbluth weight after the next step
+                log_w += math.log(len(free))
+                copies = 1
+                if perm and log_ref[n + 1] is not None:
+                    threshold = ((prior_weight[n + 1] + weight_sum[n + 1]) / done
+                                 * ((prior_samples[n + 1] + samples[n + 1]) / done) ** 2)
+                    ratio = math.exp(min(log_w - log_ref[n + 1], 700.)) / threshold
+                    if ratio > enrich and n_chains < max_chains:
+                        copies = int(min(len(free), math.ceil(ratio / enrich), max_chains - n_chains + 1))
+                    elif ratio < prune:
+                        if uniform() < ratio / prune:
+                            log_w += math.log(prune / ratio)
+                        else:
+                            copies = 0
+                if copies > 0:
+                    # copies step to different free neighbours chosen at random
+                    for j in range(copies):
+                        k = j + int(uniform() * (len(free) - j))
+                        free[j], free[k] = free[k], free[j]
+                    steps = free[:copies]
+                    log_w -= math.log(copies)
+                    n_chains += copies - 1
+                    if copies > 1:
+                        branches.append([n, log_w, steps[1:]])
+
+            if not steps:
+                # chain has reached n_steps, is pruned or trapped: go back to the last copy
+                if not branches:
+                    break
+                m, log_w, waiting = branches[-1]
+                steps = [waiting.pop()]
+                if not waiting:
+                    branches.pop()
+                for k in range(m + 1, n + 1):
+                    occupied.discard(keys[k])
+                n = m
+
+            c = steps[0]
+            x = tuple(a + b for a, b in zip(position[n], units[c]))
+            keys[n + 1] = keys[n] + key_steps[c]
+            occupied.add(keys[n + 1])
+            position[n + 1] = x
+            sum_pos[n + 1] = tuple(a + b for a, b in zip(sum_pos[n], x))
+            sum_sq[n + 1] = sum_sq[n] + sum(a * a for a in x)
+            choice[n + 1] = c
+            n += 1
+
+    return {'log_ref': np.array([np.nan if ref is None else ref for ref in log_ref]),
+            'weight_sum': np.array(weight_sum),
+            'end_to_end2': np.array(end_to_end2),
+            'gyration2': np.array(gyration2),
+            'samples': np.array(samples, dtype=np.int64),
+            'tours': np.array(tours, dtype=np.int64),
+            'n_tours': stop - start,
+            'chains': chains,
+            'chain_log_weights': np.array(chain_log_weights)}
+
+
+def scaling_exponent(n, r2, n_min=10):
+    '''
+    n - numbers of steps N, r2 - R^2(N) (end-to-end distance or radius of gyration)
+    returns exponent nu of R ~ N^nu fitted in log-log scale for N >= n_min
+    '''
+    mask = (n >= n_min) & (r2 > 0)
+    m = np.polyfit(np.log10(n[mask]), np.log10(r2[mask]), 1)
+    return m[0] / 2
@@ -0,0 +1,281 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+'''
+Spectral analysis of random walks on networks.
+
+As in random_walks.ipynb, for graph G with adjacency matrix A and degree matrix D the
+transition matrix of the random walk is T = D^{-1} A. Matrix S = D^{-1/2} A D^{-1/2}
+is symmetric and has the same eigenvalues 1 = lambda_1 > lambda_2 >= ... as T, with
+orthonormal eigenvectors psi_k. Then T^t = D^{-1/2} (sum_k lambda_k^t psi_k psi_k^T) D^{1/2}.
+
+From the spectrum we get without simulating walks (L.Lovasz, Random walks on graphs: a survey):
+1. mean first passage times H(i, j) = 2m sum_{k>=2} 1/(1 - lambda_k) (psi_kj^2 / d_j - psi_ki psi_kj / sqrt(d_i d_j)),
+   where m is the number of edges;
+2. Kemeny constant K = sum_{k>=2} 1/(1 - lambda_k);
+3. mean return time to node i, 2m / d_i, and distributions of first passage and return times.
+
+The spectrum of a graph is computed once and cached. For large graphs only n_modes leading
+modes (largest lambda_k, slowest relaxation) are computed with the sparse eigensolver. The sums
+over modes are then split into the computed modes and the rest: with the projector
+P = I - sum_{computed k} psi_k psi_k^T the rest of the fundamental matrix,
+sum_{other k} psi_k psi_k^T / (1 - lambda_k) = P (I - S)^+ P (pseudo-inverse), is applied to vectors by
+conjugate gradients on P (I - S) P. Without the slow modes this matrix has eigenvalues
+1 - lambda_k >= 1 - lambda_{n_modes + 1}, so the more modes are computed, the faster CG converges.
+1. mean first passage times use columns of Z for the targets, solved for blocks of targets at once;
+2. Kemeny constant is the sum over the computed modes plus the trace of the rest, estimated
+   with random +-1 probe vectors z as the mean of z^T P (I - S)^+ P z (Hutchinson estimator),
+   with its statistical error;
+3. transition probabilities are computed by propagating the distributions p_{t+1} = A D^{-1} p_t
+   with the sparse adjacency matrix.
+Graphs with up to 2000 nodes always get the full spectrum, dense eigensolver is faster there.
+'''
+
+import hashlib
+import warnings
+
+import networkx as nx
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+from scipy.sparse.linalg import eigsh
+
+from random_streams import DEFAULT_SEED, as_rng
+
+
+_spectrum_cache = {}
+
+# graphs with at most DENSE_NODES nodes get the full spectrum
+DENSE_NODES = 2000
+
+
+def _adjacency(graph):
+    '''
+    graph - networkx graph, numpy array or scipy sparse matrix
+    returns adjacency matrix in CSR format
+    '''
+    if isinstance(graph, nx.Graph):
+        return sparse.csr_matrix(nx.to_scipy_sparse_array(graph, dtype=np.float64))
+    return sparse.csr_matrix(graph, dtype=np.float64)
+
+
+def _graph_key(A, n_modes):
+    digest = hashlib.sha1()
+    for array in (A.indptr, A.indices, A.data):
+        digest.update(np.ascontiguousarray(array).tobytes())
+    return (A.shape[0], n_modes, digest.hexdigest())
+
+
+def walk_spectrum(graph, n_modes=None, cache=True):
+    '''
+    graph - undirected connected graph: networkx graph or (sparse) adjacency matrix
+    n_modes - number of leading modes for the sparse eigensolver,
+              None means full spectrum (dense eigensolver), it is also used for graphs
+              with at most DENSE_NODES nodes
+    cache - if True, the spectrum of the same graph is computed only once
+
+    returns dictionary
+    eigenvalues - lambda_k in decreasing order, lambda_1 = 1
+    eigenvectors - array (nodes, modes) of psi_k
+    degrees - degrees of nodes
+    edges - number of edges m (sum of weights)
+    adjacency - adjacency matrix in CSR format
+    normalized - matrix S = D^{-1/2} A D^{-1/2} in CSR format
+    full - True if all modes are computed
+    '''
+    A = _adjacency(graph)
+    A.sort_indices()
+    n = A.shape[0]
+    if n_modes is not None and (n_modes >= n - 1 or n <= DENSE_NODES):
+        n_modes = None
+    key = _graph_key(A, n_modes)
+    if cache and key in _spectrum_cache:
+        return _spectrum_cache[key]
+
+    if (A != A.T).nnz > 0:
+        raise ValueError('random walk spectrum is defined here for undirected graphs')
+    degrees = np.asarray(A.sum(axis=1)).ravel()
+    if np.any(degrees == 0) or connected_components(A, directed=False)[0] > 1:
+        raise ValueError('graph is not connected, mean first passage times are infinite')
+
+    scale = sparse.diags(1. / np.sqrt(degrees))
+    S = scale @ A @ scale
+    if n_modes is None:
+        eigenvalues, eigenvectors = np.linalg.eigh(S.toarray())
+    else:
+        eigenvalues, eigenvectors = eigsh(S, k=n_modes, which='LA')
+    order = np.argsort(eigenvalues)[::-1]
+    eigenvalues, eigenvectors = eigenvalues[order], eigenvectors[:, order]
+    # the first mode is known exactly: lambda_1 = 1, psi_1 = sqrt(d / 2m)
+    eigenvalues[0] = 1.
+    eigenvectors[:, 0] = np.sqrt(degrees / degrees.sum())
+
+    spectrum = {'eigenvalues': eigenvalues,
+                'eigenvectors': eigenvectors,
+                'degrees': degrees,
+                'edges': degrees.sum() / 2,
+                'adjacency': A,
+                'normalized': S.tocsr(),
+                'full': n_modes is None}
+    if cache:
+        _spectrum_cache[key] = spectrum
+    return spectrum
+
+
+def clear_spectrum_cache():
+    _spectrum_cache.clear()
+
+
+def _fundamental(spectrum, sources, targets, block=256):
+    '''
+    Z(i, j) = sum_{k>=2} psi_ki psi_kj / (1 - lambda_k) for i in sources, j in targets
+    block - number of targets solved at once by CG, if the spectrum is not full
+    returns Z and Z(j, j) for j in targets
+    '''
+    psi = spectrum['eigenvectors']
+    factor = 1. / (1. - spectrum['eigenvalues'][1:])
+    Z = (psi[sources, 1:] * factor) @ psi[targets, 1:].T
+    Z_targets = psi[targets, 1:] ** 2 @ factor
+    if not spectrum['full']:
+        # the rest of the modes, P (I - S)^+ P e_j for blocks of targets j
+        n = psi.shape[0]
+        for first in range(0, targets.size, block):
+            part = np.arange(first, min(first + block, targets.size))
+            right = np.zeros((n, part.size))
+            right[targets[part], np.arange(part.size)] = 1.
+            rest = _rest_solve(spectrum, right)
+            Z[:, part] += rest[sources]
+            Z_targets[part] += rest[targets[part], np.arange(part.size)]
+    return Z, Z_targets
+
+
+def _rest_solve(spectrum, B, tol=1e-10, max_iter=10000):
+    '''
+    returns X = P (I - S)^+ P B, P projects out the computed modes, by conjugate
+    gradients on P (I - S) P for all columns of B at once
+    '''
+    S = spectrum['normalized']
+    psi = spectrum['eigenvectors']
+
+    def project(Y):
+        return Y - psi @ (psi.T @ Y)
+
+    R = project(B)
+    X = np.zeros_like(R)
+    D = R.copy()
+    rr = np.einsum('ij,ij->j', R, R)
+    bound = tol ** 2 * rr
+    for _ in range(max_iter):
+        active = rr > bound
+        if not np.any(active):
+            break
+        Q = project(D - S @ D)
+        dq = np.einsum('ij,ij->j', D, Q)
+        alpha = np.where(active, rr / np.where(active, dq, 1.), 0.)
+        X += alpha * D
+        R -= alpha * Q
+        rr_new = np.einsum('ij,ij->j', R, R)
+        D = R + np.where(active, rr_new / np.where(active, rr, 1.), 0.) * D
+        rr = rr_new
+    else:
+        warnings.warn('conjugate gradients did not converge in %d iterations, '
+                      'compute more modes' % max_iter)
+    return project(X)
+
+
+def mean_first_passage_times(spectrum, sources=None, targets=None):
+    '''
+    spectrum - from walk_spectrum
+    sources, targets - lists of nodes (indices), by default all nodes
+    returns array (sources, targets) of mean first passage times H(i, j) from i to j, H(i, i) = 0
+    '''
+    n = spectrum['degrees'].size
+    sources = np.arange(n) if sources is None else np.asarray(sources)
+    targets = np.arange(n) if targets is None else np.asarray(targets)
+    d = spectrum['degrees']
+    m = spectrum['edges']
+    Z, Z_targets = _fundamental(spectrum, sources, targets)
+    H = 2 * m * (Z_targets[None, :] / d[targets][None, :]
+                 - Z / np.sqrt(d[sources][:, None] * d[targets][None, :]))
+    H[sources[:, None] == targets[None, :]] = 0.
+    return H
+
+
+def kemeny_constant(spectrum, probes=64, rng=DEFAULT_SEED, return_error=False):
+    '''
+    Kemeny constant K = sum_{k>=2} 1/(1 - lambda_k), the mean first passage time to a target
+    node chosen from the stationary distribution, which does not depend on the starting node
+    probes - number of random vectors for the trace of the modes which are not computed,
+             if the spectrum is not full
+    rng - Generator or seed of the probes
+    return_error - if True, returns (K, statistical error of K), the error is 0 for full spectrum
+    '''
+    K = np.sum(1. / (1. - spectrum['eigenvalues'][1:]))
+    error = 0.
+    if not spectrum['full']:
+        z = as_rng(rng).choice([-1., 1.], size=(spectrum['degrees'].size, probes))
+        traces = np.einsum('ij,ij->j', z, _rest_solve(spectrum, z))
+        K += traces.mean()
+        error = traces.std(ddof=1) / np.sqrt(probes) if probes > 1 else np.inf
+    return (K, error) if return_error else K
+
+
+def mean_return_times(spectrum):
+    '''
+    mean return time to every node, 2m / d_i (inverse of the stationary distribution)
+    '''
+    return 2 * spectrum['edges'] / spectrum['degrees']
+
+
+def transition_probabilities(spectrum, sources, targets, t_max):
+    '''
+    returns array (pairs, t_max + 1) of probabilities (T^t)_{ij} to be at targets[p]
+    after t steps starting from sources[p], t = 0, ..., t_max
+    '''
+    sources = np.asarray(sources)
+    targets = np.asarray(targets)
+    d = spectrum['degrees']
+    if not spectrum['full']:
+        # distributions of walks from every source, p_{t+1} = A D^{-1} p_t
+        starts, column = np.unique(sources, return_inverse=True)
+        p = np.zeros((d.size, starts.size))
+        p[starts, np.arange(starts.size)] = 1.
+        P = np.zeros((sources.size, t_max + 1))
+        for t in range(t_max + 1):
+            P[:, t] = p[targets, column]
+            p = spectrum['adjacency'] @ (p / d[:, None])
+        return P
+    psi = spectrum['eigenvectors']
+    lam = spectrum['eigenvalues']
+    powers = lam[None, :] ** np.arange(t_max + 1)[:, None]
+    weights = psi[sources] * psi[targets]
+    P = weights @ powers.T
+    return P * np.sqrt(d[targets] / d[sources])[:, None]
+
+
+def first_passage_distribution(spectrum, sources, targets, t_max=100):
+    '''
+    spectrum - from walk_spectrum
+    sources, targets - arrays of nodes, one pair (sources[p], targets[p]) per row
+    t_max - largest number of steps
+    returns array (pairs, t_max + 1) of probabilities F(t) that the walk from source reaches
+    target for the first time at step t (for source = target, first return at step t).
+    F is obtained from the renewal equation P_ij(t) = sum_{s=1}^{t} F_ij(s) P_jj(t - s).
+    '''
+    sources = np.asarray(sources)
+    targets = np.asarray(targets)
+    P = transition_probabilities(spectrum, sources, targets, t_max)
+    P_targets = transition_probabilities(spectrum, targets, targets, t_max)
+    F = np.zeros_like(P)
+    for t in range(1, t_max + 1):
+        F[:, t] = P[:, t] - np.einsum('ps,ps->p', F[:, 1:t], P_targets[:, t - 1:0:-1])
+    F[:, 0] = 0.
+    return F
+
+
+def return_time_distribution(spectrum, nodes=None, t_max=100):
+    '''
+    returns array (nodes, t_max + 1) of probabilities of the first return to node at step t
+    '''
+    nodes = np.arange(spectrum['degrees'].size) if nodes is None else np.asarray(nodes)
+    return first_passage_distribution(spectrum, nodes, nodes, t_max)
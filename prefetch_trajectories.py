@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+'''
+Loading trajectory files in background while the current trajectory is analysed.
+
+Loading big files (BM_sample.txt of INADILIC, csv of bike sharing data) with np.loadtxt
+or pd.read_csv takes time, and in a loop "load, analyse, load next" the CPU waits for
+every file. Here the next files (or chunks of one big csv file) are loaded and decoded
+by background threads and put into a bounded queue:
+depth - how many loaded trajectories can wait in the queue. When the queue is full,
+loading stops until the analysis takes the next trajectory (backpressure), so the memory
+is bounded by depth trajectories.
+
+Example:
+for file_name, traj in prefetch(file_names, depth=4):
+    conv_array = convex_hull_sliding_window(traj, np.size(traj), size_window)
+'''
+
+import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+
+def load_trajectory(file_name):
+    '''
+    loads trajectory from text file (np.loadtxt) or csv file (pd.read_csv)
+    '''
+    if os.path.splitext(file_name)[1] == '.csv':
+        return pd.read_csv(file_name)
+    return np.loadtxt(file_name)
+
+
+def prefetch(file_names, loader=load_trajectory, depth=4, workers=2):
+    '''
+    file_names - list of files (or any items accepted by loader)
+    loader - function which loads one file
+    depth - maximal number of files loaded in advance
+    workers - number of background threads
+    yields (file_name, trajectory) in the order of file_names
+    '''
+    file_names = iter(file_names)
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        try:
+            for file_name in file_names:
+                pending.append((file_name, executor.submit(loader, file_name)))
+                if len(pending) >= depth:
+                    break
+            while pending:
+                file_name, future = pending.popleft()
+                # loading of one more file starts before the current one is analysed
+                for next_name in file_names:
+                    pending.append((next_name, executor.submit(loader, next_name)))
+                    break
+                yield file_name, future.result()
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+
+_END = object()
+
+
+def prefetch_iter(iterable, depth=4):
+    '''
+    iterable - sequential source of data, e.g. pd.read_csv(file_name, chunksize=10**6)
+    depth - maximal number of items read in advance
+    yields items of iterable, which are read by a background thread
+    '''
+    items = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(entry):
+        # put waits while the queue is full, unless the consumer has stopped
+        while not stop.is_set():
+            try:
+                items.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+            put((_END, None))
+        except BaseException as error:
+            put((_END, error))
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = items.get()
+            if item is _END:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+        thread.join(timeout=1.)
+
+
+def prefetch_chunks(file_name, chunksize=10 ** 6, depth=4, **read_csv_params):
+    '''
+    yields dataframes of chunksize rows of big csv file, next chunks are read in background
+    '''
+    return prefetch_iter(pd.read_csv(file_name, chunksize=chunksize, **read_csv_params), depth)
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+'''
+Reproducible and independent random number streams for random walk simulations.
+
+Instead of global np.random.* and random.randint we give each trajectory (walker, worker)
+its own numpy Generator. Streams are spawned from one np.random.SeedSequence of the whole
+ensemble: trajectory number i gets SeedSequence(seed, spawn_key=(i,)), which is exactly
+the i-th child of SeedSequence(seed).spawn(). Therefore
+1. streams of different trajectories are independent (not correlated);
+2. any trajectory of a large ensemble can be regenerated on its own from (seed, i),
+   without generating trajectories 0, ..., i-1;
+3. the result does not depend on how trajectories are split between processes.
+Indices can be nested, e.g. (trajectory, walker).
+'''
+
+import numpy as np
+
+
+DEFAULT_SEED = 2020
+
+
+def seed_sequence(seed=DEFAULT_SEED, index=()):
+    '''
+    seed - seed of the whole ensemble (int)
+    index - index of trajectory (int) or tuple of nested indices, () is the root of the ensemble
+    returns SeedSequence of the stream
+    '''
+    if isinstance(index, (int, np.integer)):
+        index = (int(index),)
+    return np.random.SeedSequence(seed, spawn_key=tuple(int(i) for i in index))
+
+
+def trajectory_rng(seed=DEFAULT_SEED, index=()):
+    '''
+    seed - seed of the whole ensemble (int)
+    index - index of trajectory (int) or tuple of nested indices
+    returns independent Generator for this trajectory
+    '''
+    return np.random.Generator(np.random.PCG64(seed_sequence(seed, index)))
+
+
+def spawn_rngs(seed=DEFAULT_SEED, n=1, start=0):
+    '''
+    returns list of Generators for trajectories start, ..., start + n - 1
+    '''
+    return [trajectory_rng(seed, i) for i in range(start, start + n)]
+
+
+def as_rng(rng=None):
+    '''
+    rng - Generator, seed (int) or None
+    returns Generator, so that all walk generators accept the same rng argument.
+    None gives a stream with fresh entropy from the OS (not reproducible).
+    '''
+    if isinstance(rng, np.random.Generator):
+        return rng
+    if rng is None:
+        return np.random.Generator(np.random.PCG64(np.random.SeedSequence()))
+    return trajectory_rng(rng)
+
+
+def split_ensemble(n_traj, n_workers):
+    '''
+    n_traj - number of trajectories in the ensemble
+    n_workers - number of processes
+    returns list of (start, stop) ranges of trajectory indices, one range per worker.
+    Worker generates trajectory i with trajectory_rng(seed, i), so the ensemble is the same
+    for any number of workers.
+    '''
+    bounds = np.linspace(0, n_traj, n_workers + 1).astype(int)
+    return [(bounds[i], bounds[i + 1]) for i in range(n_workers) if bounds[i] < bounds[i + 1]]
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+'''
+Generators of random walks from random_walks.ipynb and random_walks_memory.ipynb.
+
+Every generator takes rng argument (Generator, seed or None, see random_streams.py),
+so that ensembles of trajectories are reproducible and can be generated in parallel.
+'''
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from random_streams import DEFAULT_SEED, as_rng, split_ensemble, trajectory_rng
+
+
+def simple_random_walk(n, dims=2, rng=None):
+    '''
+    simple markovian random walk X_{n+1} = X_n + eps_n with normal steps eps_n
+    returns array (n, dims)
+    '''
+    rng = as_rng(rng)
+    return np.cumsum(rng.standard_normal((n, dims)), axis=0)
+
+
+def lattice_random_walk(step_n, dims=1, step_set=(-1, 0, 1), rng=None):
+    '''
+    random walk with steps from step_set in each coordinate, starting at the origin
+    returns array (step_n + 1, dims)
+    '''
+    rng = as_rng(rng)
+    origin = np.zeros((1, dims))
+    steps = rng.choice(a=np.asarray(step_set), size=(step_n, dims))
+    return np.concatenate([origin, steps]).cumsum(0)
+
+
+def ctrw(n, distribution='normal', dims=2, rng=None, mu=0.5, sigma=20, beta=5, a=1, weib=1):
+    '''
+    continuous time random walk with steps from given distribution
+    distribution - 'exponential' (parameter beta), 'weibull' (weib), 'pareto' (a) or 'normal' (mu, sigma)
+    returns array (n, dims)
+    '''
+    rng = as_rng(rng)
+    size = (n, dims)
+    if distribution == 'exponential':
+        steps = rng.exponential(1. / beta, size)
+    elif distribution == 'weibull':
+        steps = rng.weibull(weib, size)
+    elif distribution == 'pareto':
+        steps = rng.pareto(a, size)
+    elif distribution == 'normal':
+        steps = rng.normal(mu, sigma, size)
+    else:
+        raise ValueError('unknown distribution of steps ' + str(distribution))
+    return np.cumsum(steps, axis=0)
+
+
+def memory_random_walk(step_n, beta, x0=1., rng=None):
+    '''
+    random walk with memory, where the step depends on the previous position
+    x(t) = x(t-1) +- x(t-2) + beta x(t-2) eps(t)
+    x0 - initial position, it should not be 0, otherwise the walk stays at 0
+    returns array (step_n + 1,)
+    '''
+    rng = as_rng(rng)
+    x = [x0]  # initial position
+    directions = rng.integers(0, 2, step_n)
+    noise = rng.normal(size=step_n)
+    for j in range(step_n):
+        if directions[j] == 1:
+            x.append(x[j] + 1 * x[j - 1] + beta * x[j - 1] * noise[j])
+        else:
+            x.append(x[j] - 1 * x[j - 1] + beta * x[j - 1] * noise[j])
+    return np.array(x)
+
+
+def interpolate_trajectory(x, k=10):
+    '''
+    we add k-1 intermediary points between two successive points of x
+    '''
+    n = len(x)
+    return np.interp(np.arange(n * k), np.arange(n) * k, x)
+
+
+def ensemble_trajectory(walk, index, seed=DEFAULT_SEED, **params):
+    '''
+    walk - generator function, e.g. ctrw
+    index - number of trajectory in the ensemble
+    returns trajectory number index of the ensemble with given seed,
+    it is regenerated on its own, without the rest of the ensemble
+    '''
+    return walk(rng=trajectory_rng(seed, index), **params)
+
+
+def _ensemble_range(args):
+    walk, start, stop, seed, params = args
+    return [ensemble_trajectory(walk, i, seed, **params) for i in range(start, stop)]
+
+
+def generate_ensemble(walk, n_traj, seed=DEFAULT_SEED, n_jobs=1, **params):
+    '''
+    walk - generator function, e.g. ctrw
+    n_traj - number of trajectories
+    n_jobs - number of processes, None means number of cores
+    returns list of n_traj trajectories, the same for any n_jobs
+    '''
+    if n_jobs is None:
+        n_jobs = os.cpu_count() or 1
+    ranges = [(walk, start, stop, seed, params) for start, stop in split_ensemble(n_traj, n_jobs)]
+    if n_jobs == 1:
+        return _ensemble_range(ranges[0]) if ranges else []
+    with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+        return [trajectory for part in executor.map(_ensemble_range, ranges) for trajectory in part]
@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+'''
+Feature vectors of trajectories for classification.
+
+For each trajectory r(t) from a dataset (e.g. AnDi challenge https://github.com/Liyubov/ANDI_datasets)
+we compute fixed vector of features, which we use in analysis_of_trajectories.ipynb:
+STD, Hurst exponent, scaling exponent alpha of MSD, convex hull volume, radius of gyration,
+statistics of jumps.
+
+Trajectories of one batch are padded with NaN to the same length and stored in one array
+(trajectories, time, dimensions), so that all features are computed with numpy for the
+whole batch at once. Displacements r(t + tau) - r(t) are computed once for every lag tau
+and are shared by MSD, Hurst exponent and jump statistics.
+Batches are processed in parallel on several cores.
+'''
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from convex_hull_analysis import hull_vertices, hulls_2d
+
+
+FEATURE_NAMES = [
+    'length',
+    'std',
+    'jump_mean',
+    'jump_std',
+    'jump_max',
+    'path_length',
+    'end_to_end',
+    'straightness',
+    'gyration_radius',
+    'msd_lag1',
+    'alpha',
+    'diffusion_coefficient',
+    'hurst',
+    'hull_volume',
+]
+
+
+def pad_trajectories(trajectories):
+    '''
+    trajectories - list of arrays (steps,) or (steps, dimensions) of different lengths
+    returns array (number of trajectories, max steps, dimensions) padded with NaN
+    and array of lengths of trajectories
+    '''
+    trajectories = [np.asarray(tr, dtype=np.float64) for tr in trajectories]
+    trajectories = [tr[:, None] if tr.ndim == 1 else tr for tr in trajectories]
+    lengths = np.array([tr.shape[0] for tr in trajectories])
+    dims = trajectories[0].shape[1]
+    batch = np.full((len(trajectories), max(lengths.max(), 1), dims), np.nan)
+    for i, tr in enumerate(trajectories):
+        batch[i, :tr.shape[0]] = tr
+    return batch, lengths
+
+
+def _loglog_slope(lags, values, valid):
+    '''
+    least squares slope and intercept of log(values) against log(lags) for every trajectory,
+    only lags marked in valid (trajectories, lags) are used
+    '''
+    x = np.log(lags)[None, :]
+    y = np.log(np.where(valid, values, 1.))
+    w = valid.astype(np.float64)
+    n = w.sum(axis=1)
+    sx = (w * x).sum(axis=1)
+    sy = (w * y).sum(axis=1)
+    sxx = (w * x * x).sum(axis=1)
+    sxy = (w * x * y).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        slope = (n * sxy - sx * sy) / (n * sxx - sx * sx)
+        intercept = (sy - slope * sx) / n
+    slope[n < 2] = np.nan
+    intercept[n < 2] = np.nan
+    return slope, intercept
+
+
+def batch_features(batch, lengths, max_lag=16, hull=True):
+    '''
+    batch - array (trajectories, steps, dimensions) padded with NaN
+    lengths - number of points in every trajectory
+    max_lag - largest lag tau used for MSD, alpha and Hurst exponent, lags are 1, 2, 4, ..., max_lag
+    hull - if True, volume of convex hull of trajectory is computed (for the whole batch at once in 1D
+           and 2D, one qhull call per trajectory in higher dimensions)
+    returns dictionary {feature name: array of values for all trajectories},
+    features of trajectories without points are NaN
+    '''
+    n_traj, steps, dims = batch.shape
+    count = lengths.astype(np.float64)
+    valid_points = np.arange(steps)[None, :] < lengths[:, None]
+    features = {'length': count}
+
+    # positions: STD and radius of gyration, moments are computed around the mean of every
+    # trajectory (E[x^2] - E[x]^2 loses precision for trajectories far from the origin)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.where(valid_points[:, :, None], batch, 0.).sum(axis=1) / count[:, None]
+        positions = np.where(valid_points[:, :, None], batch - mean[:, None, :], 0.)
+        variance = (positions ** 2).sum(axis=1) / count[:, None]
+    # STD of all coordinates together, around the mean over dimensions
+    features['std'] = np.sqrt(variance.mean(axis=1) + ((mean - mean.mean(axis=1)[:, None]) ** 2).mean(axis=1))
+    features['gyration_radius'] = np.sqrt(variance.sum(axis=1))
+
+    # jump features stay NaN if trajectories are too short for lag 1
+    features['jump_mean'] = np.full(n_traj, np.nan)
+    features['jump_std'] = np.full(n_traj, np.nan)
+    features['jump_max'] = np.full(n_traj, np.nan)
+    features['path_length'] = np.zeros(n_traj)
+    features['msd_lag1'] = np.full(n_traj, np.nan)
+
+    # displacements for all lags, lag 1 gives jumps
+    lags = 2 ** np.arange(int(np.log2(max_lag)) + 1)
+    lags = lags[lags < steps]
+    msd = np.zeros((n_traj, lags.size))
+    var_increments = np.zeros((n_traj, lags.size))
+    n_increments = np.clip(lengths[:, None] - lags[None, :], 0, None).astype(np.float64)
+    for j, lag in enumerate(lags):
+        increments = positions[:, lag:] - positions[:, :-lag]
+        valid_increments = valid_points[:, lag:]
+        increments[~valid_increments] = 0.
+        sq = (increments ** 2).sum(axis=2)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            msd[:, j] = sq.sum(axis=1) / n_increments[:, j]
+            mean_inc = increments.sum(axis=(1, 2)) / (n_increments[:, j] * dims)
+            centered = np.where(valid_increments[:, :, None], increments - mean_inc[:, None, None], 0.)
+            var_increments[:, j] = (centered ** 2).sum(axis=(1, 2)) / (n_increments[:, j] * dims)
+        if lag == 1:
+            jumps = np.sqrt(sq)
+            n_jumps = n_increments[:, j]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                path_length = jumps.sum(axis=1)
+                jump_mean = path_length / n_jumps
+                jump_var = (np.where(valid_increments, jumps - jump_mean[:, None], 0.) ** 2).sum(axis=1) / n_jumps
+            features['jump_mean'] = jump_mean
+            features['jump_std'] = np.sqrt(jump_var)
+            features['jump_max'] = np.where(n_jumps > 0, jumps.max(axis=1), np.nan)
+            features['path_length'] = path_length
+            features['msd_lag1'] = msd[:, j]
+
+    last = batch[np.arange(n_traj), np.maximum(lengths - 1, 0)]
+    features['end_to_end'] = np.sqrt(((last - batch[:, 0]) ** 2).sum(axis=1))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        features['straightness'] = features['end_to_end'] / features['path_length']
+
+    # scaling exponents from log-log fits, MSD = 2 d D tau^alpha and Var(tau) ~ tau^(2H)
+    valid_lags = (n_increments > 0) & (msd > 0)
+    alpha, intercept = _loglog_slope(lags, msd, valid_lags)
+    features['alpha'] = alpha
+    features['diffusion_coefficient'] = np.exp(intercept) / (2 * dims)
+    hurst, _ = _loglog_slope(lags, var_increments, valid_lags & (var_increments > 0))
+    features['hurst'] = hurst / 2
+
+    volume = np.full(n_traj, np.nan)
+    if hull and dims == 1:
+        volume = (np.where(valid_points, batch[:, :, 0], -np.inf).max(axis=1)
+                  - np.where(valid_points, batch[:, :, 0], np.inf).min(axis=1))
+    elif hull and dims == 2:
+        _, _, volume, _ = hulls_2d(np.where(valid_points[:, :, None], batch, 0.), valid_points)
+    elif hull:
+        for i in range(n_traj):
+            if lengths[i] > 0:
+                _, volume[i], _ = hull_vertices(batch[i, :lengths[i]])
+    features['hull_volume'] = volume
+
+    empty = lengths == 0
+    if empty.any():
+        for name in FEATURE_NAMES[1:]:
+            features[name] = np.where(empty, np.nan, features[name])
+
+    return {name: features[name] for name in FEATURE_NAMES}
+
+
+def _features_of_chunk(args):
+    trajectories, max_lag, hull = args
+    batch, lengths = pad_trajectories(trajectories)
+    return batch_features(batch, lengths, max_lag, hull)
+
+
+def extract_features(trajectories, batch_size=2000, max_lag=16, hull=True, n_jobs=None):
+    '''
+    trajectories - list of trajectories, arrays (steps,) or (steps, dimensions)
+    batch_size - number of trajectories computed together in one numpy array
+    n_jobs - number of processes, by default number of cores, 1 means no parallel processing
+    returns dataframe with one row of features per trajectory, in the order of trajectories
+    '''
+    if len(trajectories) == 0:
+        return pd.DataFrame(np.empty((0, len(FEATURE_NAMES))), columns=FEATURE_NAMES)
+    # sort by length, so that trajectories of one batch have similar lengths and padding is small
+    order = np.argsort([len(tr) for tr in trajectories], kind='stable')
+    chunks = [([trajectories[i] for i in order[start: start + batch_size]], max_lag, hull)
+              for start in range(0, len(order), batch_size)]
+
+    if n_jobs is None:
+        n_jobs = os.cpu_count() or 1
+    if n_jobs == 1 or len(chunks) == 1:
+        results = [_features_of_chunk(chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            results = list(executor.map(_features_of_chunk, chunks))
+
+    features = np.empty((len(order), len(FEATURE_NAMES)))
+    features[order] = np.concatenate(
+        [np.column_stack([result[name] for name in FEATURE_NAMES]) for result in results])
+    return pd.DataFrame(features, columns=FEATURE_NAMES)
+
+
+def save_features(features, file_name):
+    '''
+    features - dataframe from extract_features
+    file_name - columnar file, format is given by extension: .parquet, .feather or .npz
+    '''
+    extension = os.path.splitext(file_name)[1]
+    if extension == '.parquet':
+        features.to_parquet(file_name)
+    elif extension == '.feather':
+        features.to_feather(file_name)
+    elif extension == '.npz':
+        np.savez(file_name, **{name: features[name].to_numpy() for name in features.columns})
+    else:
+        raise ValueError('unknown format of features file ' + file_name)
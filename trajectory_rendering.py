@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+'''
+Fast plotting of long trajectories.
+
+In notebooks we draw trajectory points with a gradient of colors
+ax.scatter(X_tr, Y_tr, c=range(n * k), cmap=plt.cm.jet),
+which becomes too slow for more than ~10^5 points. Here are two faster ways:
+1. plot_trajectory_density: points are binned into an image of pixels, colour of a pixel is the
+   mean time of points in it (the same gradient of colors as in scatter) and brightness is
+   the number of points. Points are binned in chunks, so memory does not grow with the trajectory.
+2. plot_trajectory_lines: trajectory is decimated to a few points per pixel column, keeping
+   the points with min and max of x and y in every bucket of time (so spikes and excursions
+   are not lost), and is drawn as LineCollection coloured by time.
+'''
+
+import numpy as np
+from matplotlib import pyplot as plt
+from matplotlib.collections import LineCollection
+
+
+def trajectory_image(x, y, resolution=(800, 800), extent=None, chunk=10 ** 6):
+    '''
+    x, y - coordinates of trajectory points, in order of time
+    resolution - number of pixels (width, height)
+    extent - (xmin, xmax, ymin, ymax) of the image, by default from the trajectory
+    chunk - number of points binned at once
+    returns counts (height, width) of points in pixels, mean time (0..1) of points in pixels and extent
+    '''
+    x = np.asarray(x)
+    y = np.asarray(y)
+    n = x.size
+    if extent is None:
+        extent = (x.min(), x.max(), y.min(), y.max())
+    width, height = resolution
+    xmin, xmax, ymin, ymax = extent
+    scale_x = width / ((xmax - xmin) or 1.)
+    scale_y = height / ((ymax - ymin) or 1.)
+
+    counts = np.zeros(width * height)
+    time_sum = np.zeros(width * height)
+    for start in range(0, n, chunk):
+        stop = min(start + chunk, n)
+        xs, ys = x[start:stop], y[start:stop]
+        inside = (xs >= xmin) & (xs <= xmax) & (ys >= ymin) & (ys <= ymax)
+        ix = np.floor((xs[inside] - xmin) * scale_x).astype(np.int64)
+        iy = np.floor((ys[inside] - ymin) * scale_y).astype(np.int64)
+        # points on the right and top border go to the last pixel
+        pixel = np.minimum(iy, height - 1) * width + np.minimum(ix, width - 1)
+        time = np.arange(start, stop)[inside] / max(n - 1, 1)
+        counts += np.bincount(pixel, minlength=width * height)
+        time_sum += np.bincount(pixel, weights=time, minlength=width * height)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_time = time_sum / counts
+    return counts.reshape(height, width), mean_time.reshape(height, width), extent
+
+
+def plot_trajectory_density(ax, x, y, resolution=(800, 800), cmap=plt.cm.jet, color_by_time=True):
+    '''
+    draws trajectory as an image, see trajectory_image
+    ax - matplotlib axis
+    color_by_time - if True, colour is the mean time of points in a pixel (gradient of colors),
+                    otherwise colour is the number of points in a pixel (log scale)
+    '''
+    counts, mean_time, extent = trajectory_image(x, y, resolution)
+    density = np.log1p(counts)
+    density = density / (density.max() or 1.)
+    if color_by_time:
+        image = cmap(np.nan_to_num(mean_time))
+        image[..., 3] = np.where(counts > 0, 0.3 + 0.7 * density, 0.)
+    else:
+        image = cmap(density)
+        image[..., 3] = counts > 0
+    return ax.imshow(image, extent=extent, origin='lower', interpolation='nearest', aspect='auto')
+
+
+def decimate_minmax(x, y, n_buckets):
+    '''
+    x, y - coordinates of trajectory points
+    n_buckets - number of buckets of consecutive points
+    returns sorted indices of points which have min and max of x and y in every bucket,
+    at most 4 n_buckets points, first and last points are always kept
+    '''
+    n = np.size(x)
+    if n <= 4 * n_buckets:
+        return np.arange(n)
+    size = int(np.ceil(n / n_buckets))
+    n_full = n // size
+    indices = [np.array([0, n - 1])]
+    for values in (np.asarray(x), np.asarray(y)):
+        buckets = values[:n_full * size].reshape(n_full, size)
+        offset = np.arange(n_full) * size
+        indices += [offset + buckets.argmin(axis=1), offset + buckets.argmax(axis=1)]
+        if n_full * size < n:
+            rest = values[n_full * size:]
+            indices += [np.array([n_full * size + rest.argmin(), n_full * size + rest.argmax()])]
+    return np.unique(np.concatenate(indices))
+
+
+def plot_trajectory_lines(ax, x, y, max_points=20000, cmap=plt.cm.jet, linewidth=0.5):
+    '''
+    draws decimated trajectory as lines with a gradient of colors in time
+    ax - matplotlib axis
+    max_points - maximal number of points which are drawn
+    '''
+    x = np.asarray(x)
+    y = np.asarray(y)
+    # at least one bucket, decimate_minmax keeps up to 4 points per bucket
+    index = decimate_minmax(x, y, max(max_points // 4, 1))
+    points = np.column_stack((x[index], y[index]))
+    segments = np.stack((points[:-1], points[1:]), axis=1)
+    lines = LineCollection(segments, cmap=cmap, linewidths=linewidth)
+    lines.set_array(index[:-1] / max(x.size - 1, 1))
+    ax.add_collection(lines)
+    ax.autoscale_view()
+    return lines
+
+
+def plot_trajectory(ax, x, y, mode='auto', **params):
+    '''
+    draws trajectory with a gradient of colors in time
+    mode - 'scatter' (as in notebooks), 'density', 'lines' or 'auto':
+           scatter for less than 10^5 points, density otherwise
+    '''
+    n = np.size(x)
+    if mode == 'auto':
+        mode = 'scatter' if n < 10 ** 5 else 'density'
+    if mode == 'scatter':
+        return ax.scatter(x, y, c=range(n), linewidths=0, marker='o', s=3, cmap=params.get('cmap', plt.cm.jet))
+    if mode == 'density':
+        return plot_trajectory_density(ax, x, y, **params)
+    if mode == 'lines':
+        return plot_trajectory_lines(ax, x, y, **params)
+    raise ValueError('unknown mode of plotting ' + str(mode))
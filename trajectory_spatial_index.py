@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+'''
+Spatial index of trajectory points for questions like
+"which points of the trajectory are within r of this point":
+stops and return visits, recurrence of trajectory, self-crossings.
+
+Trajectory points are stored once in KD-tree (scipy.spatial.cKDTree), which is built
+in O(N log N) time with O(N) memory. Radius queries for many points are done with the tree,
+so we do not need the N x N matrix of distances between all points of trajectory.
+'''
+
+from itertools import chain
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+
+def build_index(data):
+    '''
+    data - trajectory, array (steps, dimensions)
+    returns KD-tree of trajectory points, tree.data is the trajectory
+    '''
+    data = np.asarray(data, dtype=np.float64)
+    if data.ndim == 1:
+        data = data[:, None]
+    return cKDTree(data)
+
+
+def points_within(tree, points, r):
+    '''
+    tree - index of trajectory from build_index
+    points - array (number of points, dimensions) of query points
+    r - radius
+    returns list of arrays of time indices of trajectory points within r of every query point
+    '''
+    return [np.array(sorted(found), dtype=np.int64)
+            for found in tree.query_ball_point(np.atleast_2d(points), r)]
+
+
+def return_visits(tree, r, min_gap=1, index=None, chunk=10000):
+    '''
+    tree - index of trajectory from build_index
+    r - radius of the neighbourhood of a point
+    min_gap - two times t1 < t2 in the neighbourhood belong to different visits
+              if the trajectory was outside of the neighbourhood for at least min_gap steps
+    index - time indices of points for which visits are counted, by default all points
+    returns number of returns (visits after the first one) to the neighbourhood of every point
+    '''
+    if index is None:
+        index = np.arange(tree.n)
+    returns = np.zeros(len(index), dtype=np.int64)
+    for start in range(0, len(index), chunk):
+        found = tree.query_ball_point(tree.data[index[start: start + chunk]], r)
+        for i, times in enumerate(found):
+            times = np.sort(times)
+            returns[start + i] = np.count_nonzero(np.diff(times) > min_gap)
+    return returns
+
+
+def recurrence_rate(tree, r, theiler=1):
+    '''
+    tree - index of trajectory from build_index
+    r - radius of recurrence
+    theiler - pairs of times closer than theiler steps are not counted (Theiler window),
+              theiler=1 excludes only pairs of the same point
+    returns fraction of pairs of times (i, j), |i - j| >= theiler, with |x_i - x_j| <= r
+    '''
+    data = tree.data
+    n = tree.n
+    # count_neighbors counts ordered pairs (i, j) including i = j
+    pairs = tree.count_neighbors(tree, r) - n
+    total = n * (n - 1)
+    for lag in range(1, min(theiler, n)):
+        close = np.sqrt(((data[lag:] - data[:-lag]) ** 2).sum(axis=1)) <= r
+        pairs -= 2 * np.count_nonzero(close)
+        total -= 2 * (n - lag)
+    return pairs / total if total > 0 else np.nan
+
+
+def _orientation(a, b, c):
+    return np.sign((b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1]) - (b[:, 1] - a[:, 1]) * (c[:, 0] - a[:, 0]))
+
+
+def _candidate_pairs(tree, middle, index, radius, chunk):
+    '''
+    pairs (i, j) of index[k] and trajectory points j of tree within radius[k] of middle[index[k]]
+    '''
+    for first in range(0, len(index), chunk):
+        found = tree.query_ball_point(middle[index[first: first + chunk]], radius[first: first + chunk])
+        counts = np.fromiter((len(f) for f in found), dtype=np.int64, count=len(found))
+        i = np.repeat(index[first: first + len(found)], counts)
+        j = np.fromiter(chain.from_iterable(found), dtype=np.int64, count=counts.sum())
+        yield i, j
+
+
+def self_crossings(data, chunk=10000):
+    '''
+    data - trajectory in 2D, array (steps, 2)
+    returns array (number of crossings, 2) of pairs (i, j), i < j, such that segments
+    x_i x_{i+1} and x_j x_{j+1} of the trajectory cross each other.
+    Candidate pairs of segments are found with KD-trees of the middle points of segments:
+    two segments can cross only if their middle points are closer than the sum of half lengths.
+    Segments are grouped by length (all segments shorter than 8 median lengths, then classes of
+    lengths growing twice), and every segment is searched for only among segments of its own
+    and shorter classes, with the radius given by its own length and the longest segment
+    of that class. So a few long jumps do not make the search radius large for all segments.
+    '''
+    data = np.asarray(data, dtype=np.float64)
+    if data.ndim != 2 or data.shape[1] != 2:
+        raise ValueError('self crossings are defined for trajectories in 2D')
+    start, end = data[:-1], data[1:]
+    middle = (start + end) / 2
+    half = np.sqrt(((end - start) ** 2).sum(axis=1)) / 2
+    if half.size == 0:
+        return np.zeros((0, 2), dtype=np.int64)
+
+    # classes of segments by length: 0 for half <= cutoff, c for cutoff 2^(c-1) < half <= cutoff 2^c
+    cutoff = 8 * np.median(half)
+    if cutoff > 0:
+        with np.errstate(divide='ignore'):
+            classes = np.maximum(np.ceil(np.log2(half / cutoff)), 0).astype(np.int64)
+    else:
+        classes = (half > 0).astype(np.int64)
+    members = {c: np.flatnonzero(classes == c) for c in np.unique(classes)}
+    trees = {c: cKDTree(middle[index]) for c, index in members.items()}
+
+    crossings = []
+    for c_i, index in members.items():
+        for c_j in members:
+            if c_j > c_i:
+                continue
+            radius = half[index] + half[members[c_j]].max()
+            for i, j in _candidate_pairs(trees[c_j], middle, index, radius, chunk):
+                j = members[c_j][j]
+                # neighbouring segments share a point, they are not counted,
+                # pairs within one class are found from both segments, we keep i < j
+                keep = (j > i + 1) if c_j == c_i else (np.abs(i - j) > 1)
+                i, j = i[keep], j[keep]
+                keep = (np.sqrt(((middle[i] - middle[j]) ** 2).sum(axis=1)) <= half[i] + half[j])
+                i, j = i[keep], j[keep]
+                cross = ((_orientation(start[i], end[i], start[j]) * _orientation(start[i], end[i], end[j]) < 0)
+                         & (_orientation(start[j], end[j], start[i]) * _orientation(start[j], end[j], end[i]) < 0))
+                i, j = i[cross], j[cross]
+                crossings.append(np.column_stack((np.minimum(i, j), np.maximum(i, j))))
+    crossings = np.concatenate(crossings).astype(np.int64)
+    return crossings[np.lexsort((crossings[:, 1], crossings[:, 0]))]